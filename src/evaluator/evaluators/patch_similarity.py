@@ -1,22 +1,70 @@
 import os
+import logging
 import tempfile
 import shutil
 import json
-import subprocess
 from typing import Dict, Any, Optional
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # optional, see the "fast" extra
+    orjson = None
+
 from ..utils.patch_utils import PatchApplier
 from ..utils.ast_utils import ASTComparator
 from ..utils.git_utils import GitManager
 from ..utils.mig_diff_filter import MigDiffFilter, filter_file_using_mig_diff
 from .base import AbstractEvaluator
 
+logger = logging.getLogger(__name__)
+
+
+def _latest_patch(root: str) -> Optional[str]:
+    """
+    Return the most recently modified *.patch file under root, or None.
+
+    A single scandir pass that reuses each entry's cached stat, instead of
+    rglob followed by a second stat() per match.
+    """
+    best_path = None
+    best_mtime = -1
+    pending = [root]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            # Like rglob, skip subdirectories that cannot be read
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.name.endswith(".patch") and entry.is_file():
+                    mtime = entry.stat().st_mtime_ns
+                    if mtime > best_mtime:
+                        best_path, best_mtime = entry.path, mtime
+    return best_path
+
+
+def _current_umask() -> int:
+    # os.umask can only be read by setting it, so put the old value straight back
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
 
 class PatchSimilarityEvaluator(AbstractEvaluator):
     def __init__(self, config, mig_diff_yaml_path: Optional[Path] = None):
         self.config = config
-        self.ast_comparator = ASTComparator()
+        self.ast_comparator = ASTComparator(
+            max_workers=os.cpu_count(),
+            cache_dir=getattr(config, "ast_cache_dir", None),
+            score_cutoff=getattr(config, "ast_score_cutoff", None),
+            # difflib unless explicitly configured; the backend changes the score
+            similarity_backend=getattr(config, "ast_similarity_backend", "difflib"),
+        )
         self.git_manager = GitManager(config.repo_path)
 
         if mig_diff_yaml_path is None:
@@ -31,6 +79,9 @@ class PatchSimilarityEvaluator(AbstractEvaluator):
                 f"Please ensure the YAML file exists at this location."
             )
 
+        # Parse mig-diff once up front rather than on every comparison
+        self._mig_filter = MigDiffFilter(self.mig_diff_yaml_path, Path(config.repo_path))
+
     def evaluate(self) -> Dict[str, Any]:
         try:
             patch_file = self._get_generated_patch_file()
@@ -50,28 +101,23 @@ class PatchSimilarityEvaluator(AbstractEvaluator):
             if not trajectory_dir.exists():
                 return None
 
-            patch_files = list(trajectory_dir.rglob("*.patch"))
-            if patch_files:
-                latest_patch = max(patch_files, key=lambda p: p.stat().st_mtime)
-                return str(latest_patch)
-
-            return None
-        except Exception as e:
+            return _latest_patch(str(trajectory_dir))
+        except OSError:
+            logger.exception("Failed to scan trajectory directory %s", trajectory_dir)
             return None
 
     def _compare_with_branches(self, patch_file: str) -> float:
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                patched_dir = os.path.join(temp_dir, "patched")
-
-                with self.git_manager.branch_context(self.config.pre_migration_branch):
-                    shutil.copytree(self.config.repo_path, patched_dir)
-
+            # A worktree of the pre-migration branch is the sandbox the patch is
+            # applied to, so the repo is neither copied nor checked out in place
+            with tempfile.TemporaryDirectory() as temp_dir, self.git_manager.worktree_context(
+                self.config.pre_migration_branch
+            ) as patched_dir:
                 applier = PatchApplier(patched_dir)
                 if not applier.apply_patch_from_file(patch_file):
                     return 0.0
 
-                if self.mig_diff_yaml_path and self.mig_diff_yaml_path.exists():
+                if self._mig_filter.is_available():
                     return self._compare_with_filtered_branch(patched_dir, temp_dir)
                 else:
                     return self._compare_with_raw_branch(patched_dir)
@@ -80,9 +126,11 @@ class PatchSimilarityEvaluator(AbstractEvaluator):
             return 0.0
 
     def _compare_with_raw_branch(self, patched_dir: str) -> float:
-        with self.git_manager.branch_context(self.config.post_migration_branch):
+        with self.git_manager.worktree_context(
+            self.config.post_migration_branch
+        ) as post_migration_dir:
             similarities = self.ast_comparator.compare_directory_asts(
-                patched_dir, self.config.repo_path
+                patched_dir, post_migration_dir
             )
 
         if similarities:
@@ -94,48 +142,47 @@ class PatchSimilarityEvaluator(AbstractEvaluator):
     def _compare_with_filtered_branch(self, patched_dir: str, temp_dir: str) -> float:
         filtered_repo_path = os.path.join(temp_dir, "filtered_repo")
 
-        mig_filter = MigDiffFilter(
-            Path(self.mig_diff_yaml_path), Path(self.config.repo_path)
-        )
-
-        if not mig_filter.is_available():
+        if not self._mig_filter.is_available():
             return self._compare_with_raw_branch(patched_dir)
 
-        shutil.copytree(self.config.repo_path, filtered_repo_path)
+        # Only the files listed in mig-diff are materialized here; everything
+        # else is read straight from the repo as an overlay base
+        os.makedirs(filtered_repo_path)
 
-        with self.git_manager.branch_context(self.config.post_migration_branch):
-            mig_diff_data = mig_filter.mig_diff_data
+        with self.git_manager.worktree_context(
+            self.config.post_migration_branch
+        ) as post_migration_dir:
+            mig_diff_data = self._mig_filter.mig_diff_data
 
+            files_to_filter = []
             for file_config in mig_diff_data["files"]:
                 file_path_rel = file_config["path"]
-                file_path = Path(self.config.repo_path) / file_path_rel
+                file_path = Path(post_migration_dir) / file_path_rel
                 filtered_file_path = Path(filtered_repo_path) / file_path_rel
                 old_file_path = Path(patched_dir) / file_path_rel
 
-                if not file_path.exists() or not old_file_path.exists():
-                    continue
-
-                try:
-                    with open(old_file_path, "r", encoding="utf-8") as f:
-                        old_file_content = f.read()
+                if file_path.exists() and old_file_path.exists():
+                    files_to_filter.append(
+                        (file_config, file_path, filtered_file_path, old_file_path)
+                    )
 
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        new_file_content = f.read()
+            # Many files share a directory, so create each one once up front
+            output_dirs = {filtered.parent for _, _, filtered, _ in files_to_filter}
+            for output_dir in output_dirs:
+                output_dir.mkdir(parents=True, exist_ok=True)
 
+            for file_config, file_path, filtered_file_path, old_file_path in files_to_filter:
+                try:
                     code_changes = file_config.get("code_changes", [])
                     if code_changes:
-                        old_file_temp = os.path.join(
-                            temp_dir, "old_files", file_path_rel
-                        )
-                        os.makedirs(os.path.dirname(old_file_temp), exist_ok=True)
-                        with open(old_file_temp, "w", encoding="utf-8") as f:
-                            f.write(old_file_content)
-
+                        # The patched file is only read by the filter, so it is
+                        # used in place rather than staged through a temp copy
                         filter_file_using_mig_diff(
-                            Path(old_file_temp),
+                            old_file_path,
                             file_path,
                             code_changes,
                             filtered_file_path,
+                            make_dirs=False,
                         )
                     else:
                         shutil.copy(old_file_path, filtered_file_path)
@@ -144,7 +191,7 @@ class PatchSimilarityEvaluator(AbstractEvaluator):
                     continue
 
         similarities = self.ast_comparator.compare_directory_asts(
-            patched_dir, filtered_repo_path
+            patched_dir, self.config.repo_path, overlay_path=filtered_repo_path
         )
 
         if similarities:
@@ -154,6 +201,7 @@ class PatchSimilarityEvaluator(AbstractEvaluator):
             return 0.0
 
     def _save_results(self, score: float) -> None:
+        tmp_file = None
         try:
             os.makedirs(self.config.score_path, exist_ok=True)
             score_file = os.path.join(self.config.score_path, "patch_similarity.json")
@@ -161,9 +209,30 @@ class PatchSimilarityEvaluator(AbstractEvaluator):
             results = {
                 "evaluator": "PatchSimilarityEvaluator",
                 "similarity_score": score,
+                "similarity_backend": self.ast_comparator.similarity_backend,
             }
 
-            with open(score_file, "w") as f:
-                json.dump(results, f, indent=2)
-        except Exception as e:
-            pass
+            if orjson is not None:
+                data = orjson.dumps(results, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps(results, indent=2).encode("utf-8")
+
+            # Write a uniquely named sibling temp file and rename it over the
+            # target, so readers never see a partially written score file and
+            # evaluators sharing a score_path never clobber each other's temp file
+            fd, tmp_file = tempfile.mkstemp(
+                dir=self.config.score_path, prefix="patch_similarity.", suffix=".tmp"
+            )
+            with os.fdopen(fd, "wb") as f:
+                # mkstemp creates 0600; give the file the mode open() would have
+                os.fchmod(f.fileno(), 0o666 & ~_current_umask())
+                f.write(data)
+            os.replace(tmp_file, score_file)
+        except (OSError, TypeError, ValueError):
+            # TypeError/ValueError cover unserializable payloads from json and orjson
+            logger.exception("Failed to save results to %s", self.config.score_path)
+            if tmp_file is not None:
+                try:
+                    os.unlink(tmp_file)
+                except OSError:
+                    pass
@@ -1,6 +1,6 @@
 from .patch_utils import PatchApplier
-from .ast_utils import ASTComparator
+from .ast_utils import ASTComparator, SourceASTCache
 from .git_utils import GitManager
 from .mig_diff_filter import MigDiffFilter, filter_file_using_mig_diff
 
-__all__ = ["PatchApplier", "ASTComparator", "GitManager", "MigDiffFilter", "filter_file_using_mig_diff"]
+__all__ = ["PatchApplier", "ASTComparator", "SourceASTCache", "GitManager", "MigDiffFilter", "filter_file_using_mig_diff"]
@@ -1,52 +1,296 @@
 import ast
+import filecmp
+import hashlib
+import marshal
 import os
-import glob
-from difflib import SequenceMatcher, unified_diff, ndiff
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Optional
+
+try:
+    from rapidfuzz.fuzz import ratio as _rf_ratio
+except ImportError:  # optional, see the "rapidfuzz" extra
+    _rf_ratio = None
+
+# difflib's Ratcliff-Obershelp ratio is the evaluator's metric. RapidFuzz's
+# Indel ratio is faster but scores differently, so it is only used on request
+_SIMILARITY_BACKENDS = ("difflib", "rapidfuzz")
+
+# Pairs needed before compare_directory_asts fans out to a process pool
+_MIN_PARALLEL_FILES = 8
+
+# Directories never descended into; they hold no .py sources
+_SKIP_DIRS = frozenset({"__pycache__"})
 
 
 class ASTComparator:
-    def compare_directory_asts(self, dir1_path: str, dir2_path: str) -> dict:
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        score_cutoff: Optional[float] = None,
+        similarity_backend: str = "difflib",
+    ):
+        # Files are parsed and compared independently, so with max_workers > 1
+        # the per-file work is spread over a process pool (ast parsing holds the GIL)
+        self.max_workers = max_workers
+        # Optional persistent cache so unchanged sources skip parsing across runs
+        self.source_cache = SourceASTCache(cache_dir) if cache_dir else None
+        # Optional lower bound: pairs scoring below it report 0.0 with either
+        # backend, and most skip the full diff. None keeps every score exact
+        self.score_cutoff = score_cutoff
+
+        if similarity_backend not in _SIMILARITY_BACKENDS:
+            raise ValueError(
+                f"Unknown similarity backend {similarity_backend!r}, "
+                f"expected one of {_SIMILARITY_BACKENDS}"
+            )
+        if similarity_backend == "rapidfuzz" and _rf_ratio is None:
+            raise ImportError(
+                "similarity_backend='rapidfuzz' requires the rapidfuzz package "
+                "(install the \"rapidfuzz\" extra)"
+            )
+        self.similarity_backend = similarity_backend
+
+    def compare_directory_asts(
+        self, dir1_path: str, dir2_path: str, overlay_path: Optional[str] = None
+    ) -> dict:
+        """
+        Compare the Python files common to two directory trees.
+
+        Files under overlay_path shadow their counterparts in dir2_path, so a
+        handful of rewritten files can be compared without copying the tree.
+        """
         similarities = {}
 
-        py_files1 = set(glob.glob(os.path.join(dir1_path, "**/*.py"), recursive=True))
-        py_files2 = set(glob.glob(os.path.join(dir2_path, "**/*.py"), recursive=True))
+        rel_files1 = dict(_iter_py_files(dir1_path))
+        rel_files2 = dict(_iter_py_files(dir2_path))
 
-        rel_files1 = {os.path.relpath(f, dir1_path): f for f in py_files1}
-        rel_files2 = {os.path.relpath(f, dir2_path): f for f in py_files2}
+        if overlay_path is not None:
+            rel_files2.update(_iter_py_files(overlay_path))
 
-        common_files = set(rel_files1.keys()) & set(rel_files2.keys())
+        common_files = rel_files1.keys() & rel_files2.keys()
         
         if len(common_files) == 0:
             return similarities
 
-        for rel_path in common_files:
-            file1 = rel_files1[rel_path]
-            file2 = rel_files2[rel_path]
-            similarity = self._compare_files(file1, file2, rel_path)
-            similarities[rel_path] = similarity
+        rel_paths = list(common_files)
+        pairs = [
+            (
+                rel_files1[rel_path],
+                rel_files2[rel_path],
+                self.source_cache,
+                self.score_cutoff,
+                self.similarity_backend,
+            )
+            for rel_path in rel_paths
+        ]
+
+        # Below a handful of files the pool startup costs more than it saves
+        if (
+            self.max_workers
+            and self.max_workers > 1
+            and len(pairs) >= _MIN_PARALLEL_FILES
+        ):
+            workers = min(self.max_workers, len(pairs))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_compare_pair_in_worker, pairs, chunksize=16)
+                for rel_path, (score, hits, misses) in zip(rel_paths, results):
+                    similarities[rel_path] = score
+                    # Workers count on their own copy of the cache; fold
+                    # their counts back so hits/misses cover pooled runs too
+                    if self.source_cache is not None:
+                        self.source_cache.hits += hits
+                        self.source_cache.misses += misses
+        else:
+            for rel_path, pair in zip(rel_paths, pairs):
+                similarities[rel_path] = _compare_pair(pair)
 
         return similarities
 
     def _compare_files(self, file1: str, file2: str, rel_path: str = None) -> float:
+        return _compare_pair(
+            (file1, file2, self.source_cache, self.score_cutoff, self.similarity_backend)
+        )
+
+
+def _iter_py_files(root: str):
+    """
+    Yield (rel_path, abs_path) for every .py file under root.
+
+    One scandir per directory with no per-entry stat or relpath. Like
+    glob("**/*.py"), hidden files and directories (.git included) are
+    skipped, as are bytecode caches.
+    """
+    pending = [(root, "")]
+    while pending:
+        dir_path, rel_dir = pending.pop()
         try:
-            # Parse files to AST
-            with open(file1, "r", encoding="utf-8") as f:
-                content1 = f.read()
-                ast1 = ast.parse(content1)
-            with open(file2, "r", encoding="utf-8") as f:
-                content2 = f.read()
-                ast2 = ast.parse(content2)
-
-            # Convert to strings and compare
-            if hasattr(ast, "unparse"):
-                str1 = ast.unparse(ast1)
-                str2 = ast.unparse(ast2)
-            else:
-                str1 = ast.dump(ast1)
-                str2 = ast.dump(ast2)
-
-            return SequenceMatcher(None, str1, str2).ratio()
-        except SyntaxError as e:
+            entries = os.scandir(dir_path)
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                rel_path = rel_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in _SKIP_DIRS:
+                        continue
+                    pending.append((entry.path, rel_path + os.sep))
+                elif entry.name.endswith(".py") and entry.is_file():
+                    yield rel_path, entry.path
+
+
+def _compare_pair_in_worker(pair: tuple) -> tuple:
+    """Score a pair in a pool worker, returning (score, cache_hits, cache_misses)."""
+    source_cache = pair[2]
+    if source_cache is None:
+        return _compare_pair(pair), 0, 0
+
+    hits, misses = source_cache.hits, source_cache.misses
+    score = _compare_pair(pair)
+    return score, source_cache.hits - hits, source_cache.misses - misses
+
+
+def _compare_pair(pair: tuple) -> float:
+    """
+    Score one (file1, file2, source_cache, score_cutoff, similarity_backend) tuple.
+
+    Module-level so a process pool can pickle it.
+    """
+    file1, file2, source_cache, score_cutoff, similarity_backend = pair
+    try:
+        str1 = _unparse_file(file1, source_cache)
+        if str1 is None:
             return 0.0
-        except Exception as e:
+
+        # Byte-identical sources unparse identically, so once one side
+        # parses the pair scores 1.0 without a second parse or the diff
+        if filecmp.cmp(file1, file2, shallow=False):
+            return 1.0
+
+        str2 = _unparse_file(file2, source_cache)
+        if str2 is None:
+            return 0.0
+
+        return _similarity(str1, str2, score_cutoff, similarity_backend)
+    except Exception as e:
+        return 0.0
+
+
+def _similarity(
+    str1: str,
+    str2: str,
+    score_cutoff: Optional[float] = None,
+    similarity_backend: str = "difflib",
+) -> float:
+    # RapidFuzz computes the normalized Indel (LCS-based) similarity in vectorized
+    # C++, a different metric from difflib's Ratcliff-Obershelp ratio
+    if similarity_backend == "rapidfuzz":
+        if score_cutoff:
+            # RapidFuzz can stop early below its cutoff. The bound is loosened a
+            # hair so the check below decides ties exactly as for difflib
+            score = _rf_ratio(str1, str2, score_cutoff=score_cutoff * 100.0 - 1e-9) / 100.0
+        else:
+            score = _rf_ratio(str1, str2) / 100.0
+    else:
+        matcher = SequenceMatcher(None, str1, str2)
+        # The quick ratios are linear-time upper bounds on ratio()
+        if score_cutoff and (
+            matcher.real_quick_ratio() < score_cutoff or matcher.quick_ratio() < score_cutoff
+        ):
             return 0.0
+        score = matcher.ratio()
+
+    # Both backends report any score below the cutoff as 0.0
+    if score_cutoff and score < score_cutoff:
+        return 0.0
+    return score
+
+
+def _unparse_file(path: str, source_cache: "Optional[SourceASTCache]" = None) -> Optional[str]:
+    """
+    Parse a file and return its unparsed AST, or None if it cannot be parsed.
+
+    Reuse across runs comes only from source_cache, which is keyed by content:
+    parsing happens in pool workers that die with each call, and the evaluator
+    compares fresh worktree paths every time.
+    """
+    if source_cache is not None:
+        return source_cache.get_unparsed(path)
+
+    with open(path, "rb") as f:
+        return _unparse_source(f.read())
+
+
+def _unparse_source(content: bytes) -> Optional[str]:
+    try:
+        tree = ast.parse(content.decode("utf-8"))
+
+        # Convert to string for comparison. unparse (always present on the
+        # supported Pythons) is what scores are defined over; ast.dump text
+        # would be a different metric
+        return ast.unparse(tree)
+    except SyntaxError as e:
+        return None
+    except Exception as e:
+        return None
+
+
+class SourceASTCache:
+    """Persistent on-disk cache of unparsed ASTs, keyed by source content."""
+
+    # Bump when the cached representation changes
+    VERSION = "v2"
+
+    def __init__(self, cache_dir: str):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the cache entries, created if missing
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def get_unparsed(self, path: str) -> Optional[str]:
+        """Return the unparsed AST of a file (None if it does not parse), parsing only on a miss."""
+        with open(path, "rb") as source:
+            # Hash straight from the file so a hit never holds the source in memory.
+            # unparse output and the marshal format can change between Python
+            # versions, so the version is part of the key
+            digest = hashlib.file_digest(source, "sha256")
+            digest.update(f"{sys.version_info[:3]}-{self.VERSION}".encode())
+            entry_path = self.cache_dir / f"{digest.hexdigest()}.marshal"
+
+            try:
+                with open(entry_path, "rb") as f:
+                    unparsed = marshal.load(f)
+                self.hits += 1
+                return unparsed
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+
+            source.seek(0)
+            content = source.read()
+
+        self.misses += 1
+        unparsed = _unparse_source(content)
+
+        # Write to a temp file and rename so concurrent workers never read a partial entry
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump(unparsed, f)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            pass
+
+        return unparsed
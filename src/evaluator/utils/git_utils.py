@@ -1,5 +1,6 @@
-import os
+import shutil
 import subprocess
+import tempfile
 from contextlib import contextmanager
 
 
@@ -7,24 +8,49 @@ class GitManager:
     def __init__(self, repo_path: str):
         self.repo_path = repo_path
 
-    def _run_git(self, command: list) -> subprocess.CompletedProcess:
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(self.repo_path)
-            return subprocess.run(["git"] + command, capture_output=True, text=True)
-        finally:
-            os.chdir(original_cwd)
+    def _run_git(self, command: list, capture: bool = True) -> subprocess.CompletedProcess:
+        # capture=False discards output for calls whose result is never read,
+        # sparing the pipes and decoding
+        if capture:
+            output = {"capture_output": True, "text": True}
+        else:
+            output = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+
+        # -C instead of chdir: no process-global cwd change, so safe to call from threads
+        return subprocess.run(["git", "-C", str(self.repo_path)] + command, **output)
 
     @contextmanager
     def branch_context(self, branch_name: str):
-        # Get current branch
-        result = self._run_git(["branch", "--show-current"])
-        original_branch = result.stdout.strip() if result.returncode == 0 else None
+        # Yield a GitManager over a temporary worktree of the branch. The main
+        # working tree is never checked out, so callers must read the branch
+        # through the yielded manager's repo_path, not this one's
+        with self.worktree_context(branch_name) as worktree_path:
+            yield GitManager(worktree_path)
+
+    @contextmanager
+    def worktree_context(self, branch_name: str):
+        # Check the branch out into a separate temporary worktree and yield its path,
+        # leaving the main working tree (and anyone else reading it) untouched
+        worktree_path = tempfile.mkdtemp(prefix="worktree-")
+        result = self._run_git(["worktree", "add", "--detach", worktree_path, branch_name])
+        if result.returncode != 0:
+            shutil.rmtree(worktree_path, ignore_errors=True)
+            raise RuntimeError(
+                f"Failed to create worktree for {branch_name}: {result.stderr.strip()}"
+            )
 
         try:
-            self._run_git(["checkout", branch_name])
-            # return control to the caller and once returned it will restore the original branch
-            yield self
+            yield worktree_path
         finally:
-            if original_branch and original_branch != branch_name:
-                self._run_git(["checkout", original_branch])
+            self._remove_worktree(worktree_path)
+
+    def _remove_worktree(self, worktree_path: str) -> None:
+        # The second --force also removes a worktree that has been locked
+        result = self._run_git(
+            ["worktree", "remove", "--force", "--force", worktree_path], capture=False
+        )
+        if result.returncode != 0:
+            # e.g. permissions: delete the checkout ourselves and let prune drop
+            # its .git/worktrees entry, so neither leaks per evaluation
+            shutil.rmtree(worktree_path, ignore_errors=True)
+            self._run_git(["worktree", "prune"], capture=False)
@@ -1,9 +1,20 @@
-import os
+import functools
+import re
 import shutil
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any
 from pathlib import Path
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader
+
+# "{old_start}[-{old_end}]:{new_start}[-{new_end}]", whitespace tolerated around numbers
+_LINE_SPEC_RE = re.compile(
+    r"\s*(\d+)\s*(?:-\s*(\d+)\s*)?:\s*(\d+)\s*(?:-\s*(\d+)\s*)?"
+)
+
 
 def clever_way_to_replace_old_range_with_new_range(
     all_changes: List[Tuple[Tuple[int, int], Tuple[int, int]]],
@@ -25,38 +36,24 @@ def clever_way_to_replace_old_range_with_new_range(
     # Sort changes by old file line number
     all_changes = sorted(all_changes, key=lambda x: x[0][0])
 
+    # Copy whole slices between changes instead of stepping line by line.
+    # cursor is the 0-indexed position of the next old line to keep.
     new_file_mig_only = []
-    old_lineno = 1
-    cur_change_idx = 0
+    cursor = 0
 
-    def should_replace(old_lineno: int) -> bool:
-        if cur_change_idx >= len(all_changes):
-            return False
-        cur_change = all_changes[cur_change_idx]
-        cur_old_range = cur_change[0]
-        if old_lineno < cur_old_range[0]:
-            return False
-        return True
+    for (old_start, old_end), (new_start, new_end) in all_changes:
+        # A change that starts inside an earlier replaced range applies right
+        # after it; one that starts past the end of the file is never reached
+        start = max(old_start - 1, cursor)
+        if start >= len(old_file):
+            break
 
-    while old_lineno <= len(old_file):
-        if not should_replace(old_lineno):
-            # Keep the old line
-            new_file_mig_only.append(old_file[old_lineno - 1])
-            old_lineno += 1
-            continue
-        
-        # Replace with new range
-        cur_change = all_changes[cur_change_idx]
-        cur_old_range = cur_change[0]
-        cur_new_range = cur_change[1]
-        
-        # Skip old lines that are being replaced
-        old_lineno = cur_old_range[1] + 1
-        
-        # Add new lines (convert to 0-indexed for list slicing)
-        new_file_mig_only.extend(new_file[cur_new_range[0] - 1 : cur_new_range[1]])
-        cur_change_idx += 1
+        # Keep the old lines up to the change, then add the new range
+        new_file_mig_only.extend(old_file[cursor:start])
+        new_file_mig_only.extend(new_file[new_start - 1 : new_end])
+        cursor = old_end
 
+    new_file_mig_only.extend(old_file[cursor:])
     return new_file_mig_only
 
 
@@ -67,21 +64,13 @@ def parse_line_spec(line_spec: str) -> Tuple[Tuple[int, int], Tuple[int, int]]:
     Format: "{old_start}[-{old_end}]:{new_start}[-{new_end}]"
     Returns: ((old_start, old_end), (new_start, new_end))
     """
-    old_range_str, new_range_str = line_spec.split(":")
-    
-    # Parse old range
-    old_range_parts = [int(n) for n in old_range_str.split("-")]
-    if len(old_range_parts) == 1:
-        old_range = (old_range_parts[0], old_range_parts[0])
-    else:
-        old_range = (old_range_parts[0], old_range_parts[1])
-    
-    # Parse new range
-    new_range_parts = [int(n) for n in new_range_str.split("-")]
-    if len(new_range_parts) == 1:
-        new_range = (new_range_parts[0], new_range_parts[0])
-    else:
-        new_range = (new_range_parts[0], new_range_parts[1])
+    match = _LINE_SPEC_RE.fullmatch(line_spec)
+    if match is None:
+        raise ValueError(f"Invalid line spec: {line_spec!r}")
+
+    old_start, old_end, new_start, new_end = match.groups()
+    old_range = (int(old_start), int(old_end or old_start))
+    new_range = (int(new_start), int(new_end or new_start))
     
     return (old_range, new_range)
 
@@ -91,6 +80,7 @@ def filter_file_using_mig_diff(
     new_file_path: Path,
     code_changes: List[Dict[str, Any]],
     output_path: Path,
+    make_dirs: bool = True,
 ) -> bool:
     """
     Filter a file to only include migration changes specified in the YAML.
@@ -100,6 +90,8 @@ def filter_file_using_mig_diff(
         new_file_path: Path to the post-migration version
         code_changes: List of code changes from YAML, each with a "line" field
         output_path: Path to write the filtered output
+        make_dirs: Create output_path's parent directory; callers that have
+            already created it pass False to skip the extra mkdir
     
     Returns:
         True if successful, False otherwise
@@ -124,8 +116,10 @@ def filter_file_using_mig_diff(
             except (ValueError, IndexError):
                 continue
 
-        if not code_change_ranges:
+        if make_dirs:
             output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if not code_change_ranges:
             shutil.copy(old_file_path, output_path)
             return True
 
@@ -133,15 +127,26 @@ def filter_file_using_mig_diff(
             code_change_ranges, old_file, new_file
         )
 
-        output_path.parent.mkdir(parents=True, exist_ok=True)
         with open(output_path, "w", encoding="utf-8") as f:
-            f.write("".join(new_file_mig_only))
+            f.writelines(new_file_mig_only)
         
         return True
     except Exception as e:
         return False
 
 
+@functools.lru_cache(maxsize=32)
+def _load_yaml(path: str, mtime_ns: int, size: int) -> Any:
+    """
+    Parse a YAML file, reusing the result while the file is unchanged.
+
+    mtime_ns and size only key the cache. The returned object is shared
+    between callers and must be treated as read-only.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
 class MigDiffFilter:
     """Filter post-migration branch files to only include migration changes."""
     
@@ -161,8 +166,10 @@ class MigDiffFilter:
     def _load_mig_diff(self):
         """Load the migration diff YAML file."""
         if self.mig_diff_yaml_path.exists():
-            with open(self.mig_diff_yaml_path, "r", encoding="utf-8") as f:
-                self.mig_diff_data = yaml.safe_load(f)
+            st = self.mig_diff_yaml_path.stat()
+            self.mig_diff_data = _load_yaml(
+                str(self.mig_diff_yaml_path), st.st_mtime_ns, st.st_size
+            )
         else:
             self.mig_diff_data = None
     
@@ -1,44 +1,137 @@
 import os
+import re
 import subprocess
 from pathlib import Path
+from typing import List, Optional, Union
+
+try:
+    import pygit2
+except ImportError:  # optional, see the "fast" extra
+    pygit2 = None
+
+# Files that git apply --reject rewrote, each also leaving a <path>.rej behind
+_REJECTED_FILE_RE = re.compile(rb"^Applying patch (.+) with \d+ rejects?\.\.\.$", re.MULTILINE)
+
+# Messages are matched verbatim, so keep git from translating them
+_GIT_ENV = {**os.environ, "LC_ALL": "C"}
 
 
 class PatchApplier:
     def __init__(self, working_dir: str):
         self.working_dir = working_dir
 
-    def apply_patch_from_file(self, patch_file_path: str) -> bool:
+    def _git_apply(
+        self,
+        options: List[str],
+        patch_paths: List[str],
+        patch_input: Optional[bytes] = None,
+    ) -> subprocess.CompletedProcess:
+        # cwd= rather than chdir, so concurrent appliers don't race on the process cwd.
+        # With no paths git apply reads the patch from stdin
+        return subprocess.run(
+            ["git", "apply", "--ignore-whitespace", *options, *patch_paths],
+            cwd=self.working_dir,
+            input=patch_input,
+            capture_output=True,
+            env=_GIT_ENV,
+        )
+
+    @staticmethod
+    def _applied_count(result: subprocess.CompletedProcess) -> int:
+        # git reports per-file progress on stderr; scan each stream once
+        return result.stdout.count(b"Applied patch") + result.stderr.count(b"Applied patch")
+
+    def apply_patch(self, patch: Union[str, bytes]) -> bool:
+        """Apply an in-memory patch by piping it to git apply, without a temp file."""
+        if isinstance(patch, str):
+            patch = patch.encode("utf-8")
+        # libgit2 applies a clean patch without forking git; anything it
+        # rejects goes through git apply and its fallbacks as before
+        if self._apply_in_process(patch):
+            return True
+        return self._apply([], patch)
+
+    def _apply_in_process(self, patch: bytes) -> bool:
+        """Apply a patch with pygit2, returning False and leaving the tree untouched if it does not apply cleanly."""
+        if pygit2 is None:
+            return False
         try:
-            original_cwd = os.getcwd()
-            os.chdir(self.working_dir)
-            
-            result = subprocess.run(
-                ["git", "apply", "--ignore-whitespace", "--reject", "--verbose", patch_file_path],
-                capture_output=True,
-                text=True,
+            # git apply resolves patch paths against the working dir, while
+            # pygit2 resolves them against the repo root, so only take over
+            # when the two are the same directory
+            repo = pygit2.Repository(
+                self.working_dir, pygit2.enums.RepositoryOpenFlag.NO_SEARCH
             )
-            
-            if result.returncode != 0:
-                if "Applied patch" in result.stdout or "Applied patch" in result.stderr:
-                    applied_count = result.stdout.count("Applied patch") + result.stderr.count("Applied patch")
-                    if applied_count > 0:
-                        os.chdir(original_cwd)
-                        return True
-                
-                result = subprocess.run(
-                    ["git", "apply", "--ignore-whitespace", "--3way", "--reject", "--verbose", patch_file_path],
-                    capture_output=True,
-                    text=True,
-                )
-                if result.returncode != 0:
-                    applied_count = result.stdout.count("Applied patch") + result.stderr.count("Applied patch")
-                    if applied_count > 0:
-                        os.chdir(original_cwd)
-                        return True
-                    os.chdir(original_cwd)
-                    return False
-            
-            os.chdir(original_cwd)
+            if repo.workdir is None or os.path.realpath(repo.workdir) != os.path.realpath(
+                self.working_dir
+            ):
+                return False
+            repo.apply(pygit2.Diff.parse_diff(patch))
+        except (pygit2.GitError, ValueError, OSError):
+            return False
+        return True
+
+    def apply_patch_from_file(self, patch_file_path: str) -> bool:
+        try:
+            patch = Path(patch_file_path).read_bytes()
+        except OSError:
+            return False
+        return self.apply_patch(patch)
+
+    def apply_patches(self, patch_paths: List[str]) -> bool:
+        """
+        Apply one or more patch files with a single git apply per attempt.
+
+        Returns True if anything applied, falling back to a 3-way merge when
+        the patches do not apply directly.
+        """
+        # Resolve against the caller's cwd, not the working dir git runs in
+        return self._apply([os.path.abspath(p) for p in patch_paths])
+
+    def _apply(self, patch_paths: List[str], patch_input: Optional[bytes] = None) -> bool:
+        try:
+            # Exit status is the success signal; the "Applied patch" lines git
+            # prints without --verbose are only consulted after a failure
+            result = self._git_apply(["--reject"], patch_paths, patch_input)
+            if result.returncode == 0:
+                return True
+            if self._applied_count(result) > 0:
+                return True
+
+            # git refuses --3way together with --reject, and --3way refuses files
+            # that no longer match the index, so undo what --reject wrote first
+            if not self._undo_rejects(result):
+                return False
+
+            # A failed 3-way apply either changed nothing or left conflict
+            # markers in the tree; neither is a usable result
+            result = self._git_apply(["--3way"], patch_paths, patch_input)
             return result.returncode == 0
         except Exception as e:
             return False
+
+    def _undo_rejects(self, result: subprocess.CompletedProcess) -> bool:
+        """
+        Restore the files a failed git apply --reject rewrote and drop its .rej files.
+
+        The rewritten files are reset to the index, which assumes the working
+        dir is a scratch checkout such as the evaluator's worktree.
+        """
+        rejected = [
+            os.fsdecode(match) for match in _REJECTED_FILE_RE.findall(result.stderr)
+        ]
+        if not rejected:
+            return True
+
+        restore = subprocess.run(
+            ["git", "checkout", "--", *rejected],
+            cwd=self.working_dir,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for path in rejected:
+            try:
+                os.remove(os.path.join(self.working_dir, path + ".rej"))
+            except OSError:
+                pass
+        return restore.returncode == 0
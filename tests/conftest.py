@@ -0,0 +1,108 @@
+import subprocess
+import textwrap
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+PRE_MOD = textwrap.dedent(
+    """\
+    import json
+
+
+    def load(path):
+        with open(path) as f:
+            return json.load(f)
+
+
+    def dump(obj, path):
+        with open(path, "w") as f:
+            json.dump(obj, f)
+    """
+)
+
+POST_MOD = textwrap.dedent(
+    """\
+    import yaml
+
+
+    def load(path):
+        with open(path) as f:
+            return yaml.safe_load(f)
+
+
+    def dump(obj, path):
+        with open(path, "w") as f:
+            yaml.safe_dump(obj, f)
+    """
+)
+
+UTIL = "def add(a, b):\n    return a + b\n"
+
+MIG_DIFF = textwrap.dedent(
+    """\
+    files:
+      - path: pkg/mod.py
+        code_changes:
+          - line: "1:1"
+          - line: "6:6"
+      - path: pkg/sub/util.py
+    """
+)
+
+
+def git(repo, *args) -> str:
+    return subprocess.run(
+        ["git", "-C", str(repo), *args], capture_output=True, text=True, check=True
+    ).stdout
+
+
+def write(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+
+
+@pytest.fixture
+def migration_repo(tmp_path):
+    """
+    A repo with "pre" and "post" migration branches (json -> yaml in pkg/mod.py),
+    a trajectory holding a patch that migrates only the import, and a mig-diff.yaml.
+    """
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "config", "user.email", "test@example.com")
+    git(repo, "config", "user.name", "test")
+
+    write(repo / "pkg" / "mod.py", PRE_MOD)
+    write(repo / "pkg" / "sub" / "util.py", UTIL)
+    write(repo / "pkg" / "bad.py", "def broken(:\n    pass\n")
+    write(repo / "pkg" / ".hidden.py", "x = 1\n")
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "base")
+    git(repo, "branch", "pre")
+
+    git(repo, "checkout", "-qb", "post")
+    write(repo / "pkg" / "mod.py", POST_MOD)
+    git(repo, "commit", "-qam", "post")
+    git(repo, "checkout", "-q", "main")
+
+    # The generated patch swaps the import but leaves the json calls in place
+    write(repo / "pkg" / "mod.py", PRE_MOD.replace("import json", "import yaml"))
+    patch = git(repo, "diff")
+    git(repo, "checkout", "-q", "--", ".")
+
+    trajectory = tmp_path / "trajectory"
+    write(trajectory / "run" / "generated.patch", patch)
+
+    mig_diff = tmp_path / "mig-diff.yaml"
+    write(mig_diff, MIG_DIFF)
+
+    config = SimpleNamespace(
+        repo_path=str(repo),
+        trajectory_path=str(trajectory),
+        pre_migration_branch="pre",
+        post_migration_branch="post",
+        score_path=str(tmp_path / "score"),
+    )
+    return SimpleNamespace(repo=repo, config=config, mig_diff=mig_diff, tmp_path=tmp_path)
@@ -0,0 +1,141 @@
+import ast
+from difflib import SequenceMatcher
+
+import pytest
+
+from evaluator.utils import ASTComparator
+
+from conftest import POST_MOD, PRE_MOD, write
+
+
+def reference_score(source1: str, source2: str) -> float:
+    # The metric as originally defined: difflib ratio over ast.unparse output
+    return SequenceMatcher(
+        None, ast.unparse(ast.parse(source1)), ast.unparse(ast.parse(source2))
+    ).ratio()
+
+
+def test_compare_directory_asts_scores_common_files(tmp_path):
+    write(tmp_path / "a" / "mod.py", PRE_MOD)
+    write(tmp_path / "b" / "mod.py", POST_MOD)
+    # Formatting differences disappear once the AST is unparsed
+    write(tmp_path / "a" / "same.py", "x=1\n")
+    write(tmp_path / "b" / "same.py", "x = 1\n")
+    write(tmp_path / "a" / "bad.py", "def broken(:\n")
+    write(tmp_path / "b" / "bad.py", "def broken(:\n")
+    write(tmp_path / "a" / "only_a.py", "a = 1\n")
+    write(tmp_path / "b" / "only_b.py", "b = 1\n")
+    write(tmp_path / "a" / ".hidden.py", "h = 1\n")
+    write(tmp_path / "b" / ".hidden.py", "h = 2\n")
+    write(tmp_path / "a" / "pkg" / ".hidden_dir" / "skipped.py", "s = 1\n")
+    write(tmp_path / "b" / "pkg" / ".hidden_dir" / "skipped.py", "s = 2\n")
+    write(tmp_path / "a" / "pkg" / "nested.py", "n = 1\n")
+    write(tmp_path / "b" / "pkg" / "nested.py", "n = 1\n")
+
+    similarities = ASTComparator().compare_directory_asts(
+        str(tmp_path / "a"), str(tmp_path / "b")
+    )
+
+    assert similarities == {
+        "mod.py": reference_score(PRE_MOD, POST_MOD),
+        "same.py": 1.0,
+        "bad.py": 0.0,
+        "pkg/nested.py": 1.0,
+    }
+
+
+def test_overlay_shadows_second_tree(tmp_path):
+    write(tmp_path / "a" / "pkg" / "mod.py", PRE_MOD)
+    write(tmp_path / "a" / "pkg" / "util.py", "def add(a, b):\n    return a + b\n")
+    write(tmp_path / "a" / "new.py", "n = 1\n")
+    write(tmp_path / "b" / "pkg" / "mod.py", POST_MOD)
+    write(tmp_path / "b" / "pkg" / "util.py", "def add(a, b):\n    return b + a\n")
+    # The overlay replaces pkg/mod.py, adds new.py and leaves util.py to b
+    write(tmp_path / "overlay" / "pkg" / "mod.py", PRE_MOD)
+    write(tmp_path / "overlay" / "new.py", "n = 2\n")
+    write(tmp_path / "overlay" / "overlay_only.py", "o = 1\n")
+
+    similarities = ASTComparator().compare_directory_asts(
+        str(tmp_path / "a"), str(tmp_path / "b"), overlay_path=str(tmp_path / "overlay")
+    )
+
+    assert set(similarities) == {"pkg/mod.py", "pkg/util.py", "new.py"}
+    assert similarities["pkg/mod.py"] == 1.0
+    assert similarities["pkg/util.py"] == reference_score(
+        "def add(a, b):\n    return a + b\n", "def add(a, b):\n    return b + a\n"
+    )
+    assert similarities["new.py"] == reference_score("n = 1\n", "n = 2\n")
+
+
+def test_process_pool_matches_serial(tmp_path):
+    for i in range(10):
+        write(tmp_path / "a" / f"m{i}.py", PRE_MOD)
+        write(tmp_path / "b" / f"m{i}.py", POST_MOD if i % 2 else PRE_MOD)
+
+    serial = ASTComparator(max_workers=1).compare_directory_asts(
+        str(tmp_path / "a"), str(tmp_path / "b")
+    )
+    pooled = ASTComparator(max_workers=2).compare_directory_asts(
+        str(tmp_path / "a"), str(tmp_path / "b")
+    )
+
+    assert pooled == serial
+    assert len(serial) == 10
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_source_cache_reuses_entries_across_paths(tmp_path, max_workers):
+    # Enough files that max_workers=2 goes through the process pool
+    for i in range(10):
+        write(tmp_path / "a" / f"m{i}.py", PRE_MOD + f"n = {i}\n")
+        write(tmp_path / "b" / f"m{i}.py", POST_MOD + f"n = {i}\n")
+        write(tmp_path / "c" / f"m{i}.py", POST_MOD + f"n = {i}\n")
+    comparator = ASTComparator(max_workers=max_workers, cache_dir=str(tmp_path / "cache"))
+
+    first = comparator.compare_directory_asts(str(tmp_path / "a"), str(tmp_path / "b"))
+    assert (comparator.source_cache.hits, comparator.source_cache.misses) == (0, 20)
+
+    # Same contents under a different path hit the content-keyed cache
+    second = comparator.compare_directory_asts(str(tmp_path / "a"), str(tmp_path / "c"))
+    assert (comparator.source_cache.hits, comparator.source_cache.misses) == (20, 20)
+
+    assert first == second
+    assert first["m0.py"] == reference_score(PRE_MOD + "n = 0\n", POST_MOD + "n = 0\n")
+
+
+@pytest.mark.parametrize("backend", ["difflib", "rapidfuzz"])
+def test_score_cutoff_zeroes_scores_below_it(tmp_path, backend):
+    if backend == "rapidfuzz":
+        pytest.importorskip("rapidfuzz")
+    # Same characters in a different order: difflib's quick_ratio() is 1.0
+    # while the real score is far below the cutoff
+    write(tmp_path / "a" / "low.py", "x = 'abcdefghijklmnop'\n")
+    write(tmp_path / "b" / "low.py", "y = 'ponmlkjihgfedcba'\n")
+    write(tmp_path / "a" / "high.py", PRE_MOD)
+    write(tmp_path / "b" / "high.py", PRE_MOD.replace("obj", "data"))
+
+    exact = ASTComparator(similarity_backend=backend).compare_directory_asts(
+        str(tmp_path / "a"), str(tmp_path / "b")
+    )
+    cut = ASTComparator(similarity_backend=backend, score_cutoff=0.9).compare_directory_asts(
+        str(tmp_path / "a"), str(tmp_path / "b")
+    )
+
+    assert 0.0 < exact["low.py"] < 0.9
+    assert 0.9 <= exact["high.py"] < 1.0
+    assert cut == {"low.py": 0.0, "high.py": exact["high.py"]}
+
+
+def test_pycache_directories_are_skipped(tmp_path):
+    write(tmp_path / "a" / "mod.py", "m = 1\n")
+    write(tmp_path / "b" / "mod.py", "m = 1\n")
+    write(tmp_path / "a" / "__pycache__" / "cached.py", "c = 1\n")
+    write(tmp_path / "b" / "__pycache__" / "cached.py", "c = 2\n")
+    write(tmp_path / "a" / "pkg" / "__pycache__" / "nested.py", "c = 1\n")
+    write(tmp_path / "b" / "pkg" / "__pycache__" / "nested.py", "c = 2\n")
+
+    similarities = ASTComparator().compare_directory_asts(
+        str(tmp_path / "a"), str(tmp_path / "b")
+    )
+
+    assert similarities == {"mod.py": 1.0}
@@ -0,0 +1,95 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from evaluator.utils import GitManager
+
+from conftest import POST_MOD, PRE_MOD, git
+
+
+def worktrees(repo) -> list:
+    return [
+        line for line in git(repo, "worktree", "list", "--porcelain").splitlines()
+        if line.startswith("worktree ")
+    ]
+
+
+@pytest.fixture
+def scratch_tmpdir(tmp_path, monkeypatch):
+    # Point mkdtemp at an empty directory so leaked worktree dirs are visible
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(scratch))
+    return scratch
+
+
+def test_worktree_context_checks_out_branch_and_cleans_up(migration_repo, scratch_tmpdir):
+    manager = GitManager(migration_repo.config.repo_path)
+
+    with manager.worktree_context("post") as worktree_path:
+        assert Path(worktree_path, "pkg", "mod.py").read_text() == POST_MOD
+        # The main checkout is left alone
+        assert (migration_repo.repo / "pkg" / "mod.py").read_text() == PRE_MOD
+        assert len(worktrees(migration_repo.repo)) == 2
+
+    assert not os.path.exists(worktree_path)
+    assert len(worktrees(migration_repo.repo)) == 1
+    assert os.listdir(scratch_tmpdir) == []
+    assert git(migration_repo.repo, "branch", "--show-current").strip() == "main"
+
+
+def test_worktree_context_unknown_branch_leaves_nothing_behind(migration_repo, scratch_tmpdir):
+    manager = GitManager(migration_repo.config.repo_path)
+
+    with pytest.raises(RuntimeError, match="no-such-branch"):
+        with manager.worktree_context("no-such-branch"):
+            pass
+
+    assert os.listdir(scratch_tmpdir) == []
+    assert len(worktrees(migration_repo.repo)) == 1
+
+
+def test_worktree_context_removes_locked_worktree(migration_repo, scratch_tmpdir):
+    manager = GitManager(migration_repo.config.repo_path)
+
+    with manager.worktree_context("post") as worktree_path:
+        git(migration_repo.repo, "worktree", "lock", worktree_path)
+
+    assert not os.path.exists(worktree_path)
+    assert len(worktrees(migration_repo.repo)) == 1
+
+
+def test_worktree_context_prunes_when_remove_fails(migration_repo, scratch_tmpdir, monkeypatch):
+    manager = GitManager(migration_repo.config.repo_path)
+    run_git = manager._run_git
+
+    def failing_remove(command, capture=True):
+        if command[:2] == ["worktree", "remove"]:
+            return run_git(["worktree", "remove", "/nonexistent"], capture)
+        return run_git(command, capture)
+
+    monkeypatch.setattr(manager, "_run_git", failing_remove)
+
+    with manager.worktree_context("post") as worktree_path:
+        pass
+
+    assert not os.path.exists(worktree_path)
+    assert len(worktrees(migration_repo.repo)) == 1
+
+
+def test_branch_context_yields_manager_over_branch_worktree(migration_repo):
+    manager = GitManager(migration_repo.config.repo_path)
+
+    with manager.branch_context("post") as branch_manager:
+        assert branch_manager.repo_path != manager.repo_path
+        assert Path(branch_manager.repo_path, "pkg", "mod.py").read_text() == POST_MOD
+        # The yielded manager runs git in the worktree
+        head = branch_manager._run_git(["rev-parse", "HEAD"]).stdout.strip()
+        assert head == git(migration_repo.repo, "rev-parse", "post").strip()
+        # The main checkout never moves
+        assert (migration_repo.repo / "pkg" / "mod.py").read_text() == PRE_MOD
+
+    assert not Path(branch_manager.repo_path).exists()
+    assert len(worktrees(migration_repo.repo)) == 1
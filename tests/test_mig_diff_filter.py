@@ -0,0 +1,62 @@
+import pytest
+
+from evaluator.utils.mig_diff_filter import (
+    clever_way_to_replace_old_range_with_new_range,
+    parse_line_spec,
+)
+
+OLD = [f"o{i}\n" for i in range(1, 7)]
+NEW = [f"n{i}\n" for i in range(1, 7)]
+
+
+# Expected outputs are those of the original line-by-line implementation,
+# quirks included, so the slice-based rewrite must match them exactly
+@pytest.mark.parametrize(
+    "changes, expected",
+    [
+        pytest.param([], "o1 o2 o3 o4 o5 o6", id="no-changes"),
+        pytest.param([((2, 2), (2, 2))], "o1 n2 o3 o4 o5 o6", id="single-line"),
+        pytest.param([((2, 3), (2, 5))], "o1 n2 n3 n4 n5 o4 o5 o6", id="grow"),
+        pytest.param([((2, 3), (3, 2))], "o1 o4 o5 o6", id="empty-new-range-deletes"),
+        pytest.param([((5, 5), (5, 5)), ((1, 1), (1, 1))], "n1 o2 o3 o4 n5 o6", id="unsorted"),
+        # A change starting inside an earlier one applies right after it
+        pytest.param([((2, 4), (2, 2)), ((3, 5), (4, 4))], "o1 n2 n4 o6", id="overlapping"),
+        # ...and a change nested in an earlier one resumes after its own end
+        pytest.param([((2, 5), (2, 2)), ((3, 3), (6, 6))], "o1 n2 n6 o4 o5 o6", id="nested"),
+        # A reversed old range replaces nothing and rewinds to its end
+        pytest.param([((4, 2), (4, 4))], "o1 o2 o3 n4 o3 o4 o5 o6", id="reversed-old-range"),
+        pytest.param([((6, 6), (6, 6))], "o1 o2 o3 o4 o5 n6", id="last-line"),
+        pytest.param([((9, 9), (1, 1))], "o1 o2 o3 o4 o5 o6", id="past-eof-ignored"),
+        pytest.param([((5, 9), (5, 6))], "o1 o2 o3 o4 n5 n6", id="straddles-eof"),
+    ],
+)
+def test_replace_old_ranges_with_new_ranges(changes, expected):
+    result = clever_way_to_replace_old_range_with_new_range(changes, OLD, NEW)
+
+    assert "".join(result).split() == expected.split()
+
+
+def test_replace_without_changes_returns_a_copy():
+    result = clever_way_to_replace_old_range_with_new_range([], OLD, NEW)
+
+    assert result == OLD
+    assert result is not OLD
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("3:3", ((3, 3), (3, 3))),
+        ("2:6-9", ((2, 2), (6, 9))),
+        ("1-4:2", ((1, 4), (2, 2))),
+        (" 3 - 4 : 5 ", ((3, 4), (5, 5))),
+    ],
+)
+def test_parse_line_spec(spec, expected):
+    assert parse_line_spec(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["3-4-5:1", "+3:4", "1_0:2", "a:1", "3", "3:", ""])
+def test_parse_line_spec_rejects_malformed_specs(spec):
+    with pytest.raises(ValueError):
+        parse_line_spec(spec)
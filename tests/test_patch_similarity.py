@@ -0,0 +1,122 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from evaluator import PatchSimilarityEvaluator
+from evaluator.evaluators.patch_similarity import _latest_patch
+
+from conftest import git, write
+
+# Scores produced by the original copy-and-checkout implementation on the
+# migration_repo fixture; the evaluator must keep reproducing them
+BASELINE_FILTERED_SCORE = 0.6534148827726809
+BASELINE_RAW_SCORE = 0.6405622489959839
+
+
+def assert_repo_untouched(repo):
+    assert git(repo, "branch", "--show-current").strip() == "main"
+    assert git(repo, "status", "--porcelain") == ""
+    assert len(git(repo, "worktree", "list").splitlines()) == 1
+
+
+def test_filtered_score_matches_baseline(migration_repo):
+    evaluator = PatchSimilarityEvaluator(
+        migration_repo.config, mig_diff_yaml_path=migration_repo.mig_diff
+    )
+
+    result = evaluator.evaluate()
+
+    assert result == {"similarity_score": pytest.approx(BASELINE_FILTERED_SCORE), "status": "success"}
+    assert_repo_untouched(migration_repo.repo)
+
+
+def test_raw_score_matches_baseline(migration_repo):
+    # Without a usable "files" list the post-migration branch is compared as is
+    migration_repo.mig_diff.write_text("files: not-a-list\n")
+    evaluator = PatchSimilarityEvaluator(
+        migration_repo.config, mig_diff_yaml_path=migration_repo.mig_diff
+    )
+
+    result = evaluator.evaluate()
+
+    assert result == {"similarity_score": pytest.approx(BASELINE_RAW_SCORE), "status": "success"}
+    assert_repo_untouched(migration_repo.repo)
+
+
+def test_missing_mig_diff_is_rejected(migration_repo):
+    with pytest.raises(FileNotFoundError):
+        PatchSimilarityEvaluator(
+            migration_repo.config, mig_diff_yaml_path=migration_repo.tmp_path / "missing.yaml"
+        )
+
+
+def test_latest_patch_prefers_newest_and_skips_unreadable_dirs(tmp_path, monkeypatch):
+    older = tmp_path / "a" / "older.patch"
+    newer = tmp_path / "b" / "c" / "newer.patch"
+    write(older, "")
+    write(newer, "")
+    write(tmp_path / "b" / "notes.txt", "")
+    os.utime(older, ns=(1_000_000_000, 1_000_000_000))
+    os.utime(newer, ns=(2_000_000_000, 2_000_000_000))
+    write(tmp_path / "locked" / "newest.patch", "")
+
+    scandir = os.scandir
+
+    def guarded_scandir(path):
+        if Path(path).name == "locked":
+            raise PermissionError(13, "Permission denied", path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", guarded_scandir)
+
+    assert _latest_patch(str(tmp_path)) == str(newer)
+
+
+def test_missing_patch_fails(migration_repo):
+    for patch in Path(migration_repo.config.trajectory_path).rglob("*.patch"):
+        patch.unlink()
+    evaluator = PatchSimilarityEvaluator(
+        migration_repo.config, mig_diff_yaml_path=migration_repo.mig_diff
+    )
+
+    assert evaluator.evaluate() == {"error": "No patch found", "status": "failed"}
+
+
+@pytest.mark.parametrize("umask", [0o022, 0o077])
+def test_score_file_is_written_atomically_with_umask_mode(migration_repo, umask):
+    evaluator = PatchSimilarityEvaluator(
+        migration_repo.config, mig_diff_yaml_path=migration_repo.mig_diff
+    )
+
+    previous = os.umask(umask)
+    try:
+        evaluator._save_results(0.5)
+    finally:
+        os.umask(previous)
+
+    score_dir = Path(migration_repo.config.score_path)
+    # No temp file is left next to the score file
+    assert [p.name for p in score_dir.iterdir()] == ["patch_similarity.json"]
+    score_file = score_dir / "patch_similarity.json"
+    assert json.loads(score_file.read_text()) == {
+        "evaluator": "PatchSimilarityEvaluator",
+        "similarity_score": 0.5,
+        "similarity_backend": "difflib",
+    }
+    assert score_file.stat().st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_failed_score_write_leaves_no_temp_file(migration_repo, monkeypatch):
+    evaluator = PatchSimilarityEvaluator(
+        migration_repo.config, mig_diff_yaml_path=migration_repo.mig_diff
+    )
+
+    def failing_replace(src, dst):
+        raise OSError("replace failed")
+
+    monkeypatch.setattr(os, "replace", failing_replace)
+    evaluator._save_results(0.5)
+
+    assert list(Path(migration_repo.config.score_path).iterdir()) == []
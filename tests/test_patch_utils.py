@@ -0,0 +1,97 @@
+import pytest
+
+from evaluator.utils import PatchApplier
+
+from conftest import git, write
+
+SOURCE = "".join(f"a{i} = {i}\n" for i in range(20))
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "config", "user.email", "test@example.com")
+    git(repo, "config", "user.name", "test")
+    write(repo / "a.py", SOURCE)
+    write(repo / "b.py", SOURCE)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "base")
+    return repo
+
+
+def make_patch(repo, **edits) -> str:
+    # Diff of the given edits against HEAD, with the tree reset afterwards
+    for name, (old, new) in edits.items():
+        path = repo / f"{name}.py"
+        path.write_text(path.read_text().replace(old, new))
+    patch = git(repo, "diff")
+    git(repo, "checkout", "-q", "--", ".")
+    return patch
+
+
+def commit(repo, name, old, new):
+    path = repo / f"{name}.py"
+    path.write_text(path.read_text().replace(old, new))
+    git(repo, "commit", "-qam", f"edit {name}")
+
+
+def leftovers(repo) -> list:
+    return sorted(p.name for p in repo.iterdir() if p.suffix in (".rej", ".orig"))
+
+
+def test_clean_patch_applies(repo):
+    patch = make_patch(repo, a=("a3 = 3", "a3 = 'X'"))
+
+    assert PatchApplier(str(repo)).apply_patch(patch)
+
+    assert "a3 = 'X'" in (repo / "a.py").read_text()
+
+
+def test_partially_applying_patch_keeps_clean_files(repo):
+    patch = make_patch(repo, a=("a3 = 3", "a3 = 'X'"), b=("a3 = 3", "a3 = 'X'"))
+    commit(repo, "b", "a3 = 3", "a3 = 'Y'")
+
+    assert PatchApplier(str(repo)).apply_patch(patch)
+
+    assert "a3 = 'X'" in (repo / "a.py").read_text()
+    assert "a3 = 'Y'" in (repo / "b.py").read_text()
+
+
+def test_drifted_patch_falls_back_to_three_way_merge(repo):
+    patch = make_patch(repo, a=("a3 = 3", "a3 = 'X'"))
+    # A nearby edit breaks the hunk's context without touching its lines
+    commit(repo, "a", "a1 = 1", "a1 = 'changed'")
+
+    assert PatchApplier(str(repo)).apply_patch(patch)
+
+    source = (repo / "a.py").read_text()
+    assert "a3 = 'X'" in source
+    assert "a1 = 'changed'" in source
+    assert "<<<<<<<" not in source
+    assert leftovers(repo) == []
+
+
+def test_conflicting_patch_fails(repo):
+    patch = make_patch(repo, a=("a3 = 3", "a3 = 'X'"))
+    commit(repo, "a", "a3 = 3", "a3 = 'Y'")
+
+    assert not PatchApplier(str(repo)).apply_patch(patch)
+
+
+def test_in_process_apply_only_takes_the_repo_root(repo):
+    pytest.importorskip("pygit2")
+    write(repo / "sub" / "a.py", SOURCE)
+    git(repo, "add", "-A")
+    git(repo, "commit", "-qm", "sub")
+    patch = make_patch(repo, a=("a3 = 3", "a3 = 'X'"))
+
+    # git apply leaves paths outside a subdirectory working dir alone, so
+    # pygit2 must not patch the root's a.py on its behalf
+    PatchApplier(str(repo / "sub")).apply_patch(patch)
+    assert (repo / "a.py").read_text() == SOURCE
+    assert not PatchApplier(str(repo / "sub"))._apply_in_process(patch.encode())
+
+    assert PatchApplier(str(repo))._apply_in_process(patch.encode())
+    assert "a3 = 'X'" in (repo / "a.py").read_text()